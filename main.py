@@ -1,9 +1,12 @@
 import time
-import hashlib
+import functools
 import json
 import logging
 import os
+import random
+import threading
 import tomllib  # Python 3.11+
+from collections import OrderedDict
 from typing import Dict, List, Optional, Set, Any, Union
 from bridge.context import ContextType
 from bridge.reply import Reply, ReplyType
@@ -20,6 +23,88 @@ except ImportError:
     # 如果tomli也不可用，则继续使用JSON格式
     pass
 
+# 优先使用orjson解析分享内容，未安装时回退到标准库json
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 机器人可能提供的Mac协议转发接口
+_BOT_CAPABILITIES = (
+    'send_cdn_img_msg',
+    'send_cdn_voice_msg',
+    'send_cdn_video_msg',
+    'send_cdn_file_msg',
+    'forward_mini_app',
+    'forward_url',
+)
+
+# 可通过CDN接口转发的消息类型: (机器人转发接口, 类型名称, 回退处理方法)
+_CDN_FORWARD_TABLE = {
+    ContextType.IMAGE: ('send_cdn_img_msg', '图片', '_fallback_image'),
+    ContextType.VOICE: ('send_cdn_voice_msg', '语音', '_fallback_voice'),
+    ContextType.VIDEO: ('send_cdn_video_msg', '视频', '_fallback_video'),
+    ContextType.FILE: ('send_cdn_file_msg', '文件', '_fallback_file'),
+}
+
+# 待转发消息队列容量
+_FORWARD_QUEUE_SIZE = 1024
+# 原始消息缓存过期时间(秒)，仅用于兜底清理，正常情况下转发完成后即移除
+_RAW_MESSAGE_TTL = 600
+# 单条消息重试等待的总时长上限(秒)，避免一条消息长时间阻塞后续消息的转发
+_MAX_RETRY_WAIT = 10
+
+class _TTLCache:
+    """有界过期缓存，条目按写入顺序排列，过期和超量淘汰均从头部弹出"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()  # key -> (过期时间, value)
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        # 所有条目TTL相同，写入顺序即过期顺序，遇到第一个未过期的条目即可停止
+        data = self._data
+        while data:
+            key, (expire_at, _) = next(iter(data.items()))
+            if expire_at > now:
+                break
+            del data[key]
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            item = self._data.get(key)
+            # ttl被修改后写入顺序不再等于过期顺序，需逐条检查过期时间
+            return item is not None and item[0] > now
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            self._data.pop(key, None)
+            self._data[key] = (now + self.ttl, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            item = self._data.get(key)
+            return item[1] if item is not None and item[0] > now else default
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
 class MacMessageForwarder(PluginBase):
     """
     Mac协议消息转发插件 - 支持转发所有类型消息，包括
@@ -34,30 +119,95 @@ class MacMessageForwarder(PluginBase):
     9. 链接卡片等
     """
     
+    # 当前生效的插件实例
+    _active_instance: Optional["MacMessageForwarder"] = None
+    
     def __init__(self):
         super().__init__()
         self.handlers[Event.ON_HANDLE_CONTEXT] = self.on_handle_context
-        self.dedup_cache: Dict[str, float] = {}  # 用于消息去重
+        self.dedup_cache = _TTLCache(maxsize=4096, ttl=60)  # 用于消息去重，短时间内重复消息固定为1分钟
         logger.info("[MacMessageForwarder] 插件已初始化")
         
-        # 支持的消息类型
-        self.supported_types = [
-            ContextType.TEXT,           # 文本消息
-            ContextType.IMAGE,          # 图片消息  
-            ContextType.VOICE,          # 语音消息
-            ContextType.VIDEO,          # 视频消息
-            ContextType.FILE,           # 文件消息
-            ContextType.SHARING,        # 分享消息(小程序/链接)
-        ]
+        # 机器人实例及其支持的转发接口，首次转发时再获取
+        self.__bot = None
+        self._bot_caps = frozenset()
+        
+        # 消息类型到转发方法的映射，图片/语音/视频/文件统一走CDN转发
+        self._dispatch = {
+            ContextType.TEXT: self._forward_text,
+            ContextType.SHARING: self._forward_sharing,
+        }
+        for msg_type, (method_name, label, fallback_name) in _CDN_FORWARD_TABLE.items():
+            self._dispatch[msg_type] = functools.partial(
+                self._forward_via_xml, method_name=method_name, label=label, fallback=getattr(self, fallback_name)
+            )
+        
+        # 支持的消息类型：文本、图片、语音、视频、文件、分享(小程序/链接)
+        self.supported_types = frozenset(self._dispatch)
         
         # 创建事件循环，用于异步任务
         self.loop = asyncio.new_event_loop()
         
         # 从配置文件加载设置
+        self._reload_config()
+        
+        # 保存排队中消息的原始数据，key为msg_id，转发完成后移除，避免内存无限增长
+        # 容量覆盖排队中和正在转发的全部消息，保证原始数据不会被提前淘汰
+        self.raw_messages = _TTLCache(maxsize=_FORWARD_QUEUE_SIZE + 1, ttl=_RAW_MESSAGE_TTL)
+        
+        # 待转发消息队列，由后台协程按顺序统一消费，事件循环运行在独立的后台线程中
+        self._queue = asyncio.Queue(maxsize=_FORWARD_QUEUE_SIZE)
+        self._worker_task = self.loop.create_task(self._forward_worker())
+        threading.Thread(target=self._run_loop, name="MacMessageForwarder", daemon=True).start()
+        
+        # 插件被重新实例化时，停止上一个实例的事件循环，避免线程泄漏
+        previous = MacMessageForwarder._active_instance
+        MacMessageForwarder._active_instance = self
+        if previous is not None:
+            previous.close()
+
+    def _run_loop(self):
+        """在后台线程中运行事件循环，停止后关闭循环"""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def close(self):
+        """停止后台转发协程和事件循环，插件卸载时调用"""
+        if self.loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    async def _shutdown(self):
+        """取消转发协程，然后停止事件循环"""
+        self._worker_task.cancel()
+        await asyncio.gather(self._worker_task, return_exceptions=True)
+        self.loop.stop()
+        logger.info("[MacMessageForwarder] 转发事件循环已停止")
+
+    def reload(self):
+        """重新加载配置文件，修改配置后调用即可生效"""
+        self._reload_config()
+
+    def _reload_config(self):
+        """读取配置并缓存到实例属性，避免每条消息都重新读取配置文件"""
         config = self.get_config()
+        # 转发路由配置
+        self._source_group = config.get('source_group', '')
+        self._target_group = config.get('target_group', '')
+        self._monitor_users_set = frozenset(config.get('monitor_users', []))
+        self._show_sender_info = config.get('show_sender_info', True)
+        if not self._source_group:
+            logger.warning("[MacMessageForwarder] 未配置来源群组，插件将不会转发任何消息")
         # 错误重试配置
         self.max_retries = config.get('max_retries', 3)
-        self.retry_delay = config.get('retry_delay', 1)  # 秒
+        self.retry_delay = config.get('retry_delay', 1)  # 首次重试间隔(秒)，之后指数退避
         # 消息转发超时设置
         self.timeout = config.get('timeout', 30)  # 秒
         # 是否使用XML方式转发
@@ -69,12 +219,18 @@ class MacMessageForwarder(PluginBase):
         self.debug_mode = config.get('debug_mode', False)
         
         if self.debug_mode:
-            logger.info(f"[MacMessageForwarder] 当前配置: {config}")
+            logger.info("[MacMessageForwarder] 当前配置: %s", config)
         else:
             logger.info("[MacMessageForwarder] 插件配置已加载")
-        
-        # 保存所有待处理的原始消息，key为msg_id
-        self.raw_messages = {}
+
+    @property
+    def _bot(self):
+        """获取并缓存机器人实例，同时记录其支持的转发接口"""
+        if self.__bot is None:
+            bot = BOT().bot
+            self._bot_caps = frozenset(name for name in _BOT_CAPABILITIES if hasattr(bot, name))
+            self.__bot = bot
+        return self.__bot
 
     def get_help_text(self, **kwargs):
         help_text = "Mac协议消息转发插件使用说明：\n"
@@ -89,36 +245,26 @@ class MacMessageForwarder(PluginBase):
         """处理接收到的消息"""
         context = e_context['context']
         
-        # 如果不是支持的消息类型，直接返回
-        if context.type not in self.supported_types:
+        # 未配置来源群组或不是支持的消息类型，直接返回
+        if not self._source_group or context.type not in self.supported_types:
             return
             
         try:
-            # 获取消息来源信息
-            if hasattr(context, 'from_user_id'):
-                from_user_id = context.from_user_id
-            else:
-                # 某些消息可能没有from_user_id，尝试其他可能的属性
-                from_user_id = context.get('from_user_id', '')
+            # 获取消息来源信息，某些消息可能没有from_user_id属性，尝试从context中读取
+            from_user_id = getattr(context, 'from_user_id', None) or (
+                context.get('from_user_id', '') if hasattr(context, 'get') else ''
+            )
                 
             # 判断是否为群消息
-            is_group_message = '@chatroom' in from_user_id if from_user_id else False
+            is_group_message = bool(from_user_id) and from_user_id.endswith('@chatroom')
             
             # 如果不是群消息，直接返回
             if not is_group_message:
                 return
                 
             # 获取发送者信息
-            sender_id = None
-            sender_name = None
-            
-            if hasattr(context, 'actual_user_id'):
-                sender_id = context.actual_user_id
-            elif hasattr(context, 'sender_wxid'):
-                sender_id = context.sender_wxid
-                
-            if hasattr(context, 'actual_user_nickname'):
-                sender_name = context.actual_user_nickname
+            sender_id = getattr(context, 'actual_user_id', None) or getattr(context, 'sender_wxid', None)
+            sender_name = getattr(context, 'actual_user_nickname', None)
             
             # 检查是否需要转发
             if not self._should_forward(from_user_id, sender_id):
@@ -128,11 +274,6 @@ class MacMessageForwarder(PluginBase):
             msg_content = context.content
             msg_type = context.type
             
-            # 记录原始消息，用于获取XML
-            if hasattr(context, 'msg_id'):
-                msg_id = context.msg_id
-                self.raw_messages[msg_id] = context.raw
-            
             # 执行消息转发
             self._forward_message(e_context, from_user_id, sender_id, sender_name)
             
@@ -141,31 +282,20 @@ class MacMessageForwarder(PluginBase):
 
     def _should_forward(self, from_group_id: str, sender_id: str) -> bool:
         """判断是否需要转发消息"""
-        # 获取配置
-        config = self.get_config()
-        source_group = config.get('source_group', '')
-        monitor_users = config.get('monitor_users', [])
-        
         # 检查来源群组是否匹配
-        if not source_group:
-            logger.warning("[MacMessageForwarder] 未配置来源群组")
-            return False
-            
-        if source_group != from_group_id:
+        if self._source_group != from_group_id:
             return False
             
         # 检查发送者是否匹配(如果配置了monitor_users)
-        if monitor_users and sender_id not in monitor_users:
+        if self._monitor_users_set and sender_id not in self._monitor_users_set:
             return False
             
         return True
 
     def _forward_message(self, e_context: EventContext, from_group_id: str, sender_id: str, sender_name: str):
         """转发消息到目标群"""
-        # 获取配置
-        config = self.get_config()
-        target_group = config.get('target_group', '')
-        show_sender_info = config.get('show_sender_info', True)
+        target_group = self._target_group
+        show_sender_info = self._show_sender_info
         
         if not target_group:
             logger.error("[MacMessageForwarder] 未配置目标群组")
@@ -175,46 +305,80 @@ class MacMessageForwarder(PluginBase):
         context = e_context['context']
         msg_hash = self._get_message_hash(context, from_group_id)
         if self._is_duplicate(msg_hash):
-            logger.info(f"[MacMessageForwarder] 检测到重复消息，已跳过转发")
+            logger.info("[MacMessageForwarder] 检测到重复消息，已跳过转发")
             return
             
         # 根据消息类型转发
         msg_type = context.type
         
         try:
-            # 启动异步任务处理转发
-            asyncio.run_coroutine_threadsafe(
-                self._forward_message_async(e_context, msg_type, target_group, sender_name if show_sender_info else None),
-                self.loop
+            # 放入转发队列，由后台协程处理
+            self.loop.call_soon_threadsafe(
+                self._enqueue,
+                (e_context, msg_type, target_group, sender_name if show_sender_info else None),
+                msg_hash
             )
         except Exception as e:
             logger.error(f"[MacMessageForwarder] 转发消息时出错: {e}")
 
+    def _enqueue(self, item: tuple, msg_hash: Union[str, tuple]):
+        """在事件循环线程中将待转发消息放入队列"""
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # 消息未被转发，移除去重记录，使重新投递的同一消息仍可转发
+            self.dedup_cache.pop(msg_hash)
+            logger.warning("[MacMessageForwarder] 转发队列已满，消息已丢弃")
+            return
+        
+        # 记录原始消息，用于获取XML，转发完成后移除
+        context = item[0]['context']
+        msg_id = getattr(context, 'msg_id', None)
+        if msg_id is not None:
+            self.raw_messages[msg_id] = context.raw
+
+    async def _forward_worker(self):
+        """后台按顺序消费转发队列，每次唤醒后一并处理队列中积压的消息"""
+        while True:
+            item = await self._queue.get()
+            while True:
+                try:
+                    await self._forward_message_async(*item)
+                except Exception as e:
+                    logger.error(f"[MacMessageForwarder] 转发消息时出错: {e}")
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+
     async def _forward_message_async(self, e_context: EventContext, msg_type: ContextType, target_group: str, sender_name: Optional[str]):
         """异步转发消息"""
-        context = e_context['context']
-        
-        # 根据消息类型调用不同的转发方法
-        if msg_type == ContextType.TEXT:
-            await self._forward_text(e_context, target_group, sender_name)
-            
-        elif msg_type == ContextType.IMAGE:
-            await self._forward_image(e_context, target_group, sender_name)
-            
-        elif msg_type == ContextType.VOICE:
-            await self._forward_voice(e_context, target_group, sender_name)
-            
-        elif msg_type == ContextType.VIDEO:
-            await self._forward_video(e_context, target_group, sender_name)
-            
-        elif msg_type == ContextType.FILE:
-            await self._forward_file(e_context, target_group, sender_name)
-            
-        elif msg_type == ContextType.SHARING:
-            await self._forward_sharing(e_context, target_group, sender_name)
-            
-        else:
-            logger.warning(f"[MacMessageForwarder] 不支持的消息类型: {msg_type}")
+        try:
+            # 根据消息类型调用不同的转发方法
+            handler = self._dispatch.get(msg_type)
+            if handler:
+                await handler(e_context, target_group, sender_name)
+            else:
+                logger.warning(f"[MacMessageForwarder] 不支持的消息类型: {msg_type}")
+        finally:
+            # 原始消息只在本次转发中使用，转发结束后释放
+            self.raw_messages.pop(getattr(e_context['context'], 'msg_id', None))
+
+    async def _send_with_retry(self, send_fn, *args, label: str) -> bool:
+        """调用Mac协议转发接口，失败时按指数退避加随机抖动重试，等待总时长不超过_MAX_RETRY_WAIT，成功返回True"""
+        waited = 0.0
+        for i in range(self.max_retries):
+            try:
+                await send_fn(*args)
+                return True
+            except Exception as e:
+                logger.warning(f"[MacMessageForwarder] 通过XML转发{label}失败(尝试 {i+1}/{self.max_retries}): {e}")
+                if i + 1 >= self.max_retries or waited >= _MAX_RETRY_WAIT:
+                    break
+                delay = min(self.retry_delay * (1 << i) + random.random() * 0.1, _MAX_RETRY_WAIT - waited)
+                await asyncio.sleep(delay)
+                waited += delay
+        return False
 
     async def _forward_text(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
         """转发文本消息"""
@@ -227,215 +391,110 @@ class MacMessageForwarder(PluginBase):
                 
             reply = Reply(ReplyType.TEXT, content)
             e_context['channel'].send(reply, target_group)
-            logger.info(f"[MacMessageForwarder] 文本消息已转发到 {target_group}")
+            logger.info("[MacMessageForwarder] 文本消息已转发到 %s", target_group)
         except Exception as e:
             logger.error(f"[MacMessageForwarder] 转发文本消息失败: {e}")
 
-    async def _forward_image(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
-        """转发图片消息"""
+    async def _forward_via_xml(self, e_context: EventContext, target_group: str, sender_name: Optional[str],
+                               method_name: str, label: str, fallback):
+        """通过Mac协议CDN接口转发图片/语音/视频/文件消息，无法转发时调用对应的回退处理"""
         try:
             context = e_context['context']
-            raw_message = None
             
             # 获取原始消息对象
-            if hasattr(context, 'msg_id') and context.msg_id in self.raw_messages:
-                raw_message = self.raw_messages[context.msg_id]
+            raw_message = self.raw_messages.get(getattr(context, 'msg_id', None))
                 
             # 优先使用原始消息中的XML进行转发
             if raw_message and hasattr(raw_message, 'xml'):
-                # 使用Mac协议的CDN图片转发功能
-                bot = BOT().bot
-                if hasattr(bot, 'send_cdn_img_msg'):
-                    xml = raw_message.xml
-                    for i in range(self.max_retries):
-                        try:
-                            await bot.send_cdn_img_msg(target_group, xml)
-                            logger.info(f"[MacMessageForwarder] 图片消息已通过XML转发到 {target_group}")
+                bot = self._bot
+                if method_name in self._bot_caps:
+                    if await self._send_with_retry(getattr(bot, method_name), target_group, raw_message.xml, label=label):
+                        logger.info("[MacMessageForwarder] %s消息已通过XML转发到 %s", label, target_group)
+                        
+                        # 如果需要显示发送者信息，额外发送一条文本消息
+                        if sender_name:
+                            sender_text = f"👆 {label}来自: {sender_name}"
+                            reply = Reply(ReplyType.TEXT, sender_text)
+                            e_context['channel'].send(reply, target_group)
                             
-                            # 如果需要显示发送者信息，额外发送一条文本消息
-                            if sender_name:
-                                sender_text = f"👆 图片来自: {sender_name}"
-                                reply = Reply(ReplyType.TEXT, sender_text)
-                                e_context['channel'].send(reply, target_group)
-                                
-                            return
-                        except Exception as e:
-                            logger.warning(f"[MacMessageForwarder] 通过XML转发图片失败(尝试 {i+1}/{self.max_retries}): {e}")
-                            await asyncio.sleep(self.retry_delay)
+                        return
             
-            # 回退到普通方式：通过URL或路径发送
-            image_url = context.content
-            reply = Reply(ReplyType.IMAGE_URL, image_url)
+            # 回退处理
+            fallback(e_context, target_group, sender_name)
+        except Exception as e:
+            logger.error(f"[MacMessageForwarder] 转发{label}消息失败: {e}")
+
+    def _fallback_image(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
+        """图片回退处理：通过URL或路径发送"""
+        image_url = e_context['context'].content
+        reply = Reply(ReplyType.IMAGE_URL, image_url)
+        e_context['channel'].send(reply, target_group)
+        logger.info("[MacMessageForwarder] 图片消息已通过URL转发到 %s", target_group)
+        
+        # 如果需要显示发送者信息，额外发送一条文本消息
+        if sender_name:
+            sender_text = f"👆 图片来自: {sender_name}"
+            reply = Reply(ReplyType.TEXT, sender_text)
+            e_context['channel'].send(reply, target_group)
+
+    def _fallback_voice(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
+        """语音回退处理：将语音转发为文本提示"""
+        if sender_name:
+            sender_text = f"[{sender_name}] 发送了一条语音消息，但无法直接转发"
+        else:
+            sender_text = "收到一条语音消息，但无法直接转发"
+        
+        reply = Reply(ReplyType.TEXT, sender_text)
+        e_context['channel'].send(reply, target_group)
+        logger.info("[MacMessageForwarder] 语音消息无法直接转发，已发送提示到 %s", target_group)
+
+    def _fallback_video(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
+        """视频回退处理：发送视频链接或提示"""
+        video_url = e_context['context'].content
+        if video_url and (video_url.startswith('http') or video_url.startswith('/')):
+            # 尝试作为普通消息发送
+            reply = Reply(ReplyType.TEXT, f"收到视频消息，链接为: {video_url}")
             e_context['channel'].send(reply, target_group)
-            logger.info(f"[MacMessageForwarder] 图片消息已通过URL转发到 {target_group}")
             
-            # 如果需要显示发送者信息，额外发送一条文本消息
             if sender_name:
-                sender_text = f"👆 图片来自: {sender_name}"
+                sender_text = f"👆 视频来自: {sender_name}"
                 reply = Reply(ReplyType.TEXT, sender_text)
                 e_context['channel'].send(reply, target_group)
-        except Exception as e:
-            logger.error(f"[MacMessageForwarder] 转发图片消息失败: {e}")
-
-    async def _forward_voice(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
-        """转发语音消息"""
-        try:
-            context = e_context['context']
-            raw_message = None
-            
-            # 获取原始消息对象
-            if hasattr(context, 'msg_id') and context.msg_id in self.raw_messages:
-                raw_message = self.raw_messages[context.msg_id]
-                
-            # 优先使用原始消息中的XML进行转发
-            if raw_message and hasattr(raw_message, 'xml'):
-                # 使用Mac协议的语音转发功能
-                bot = BOT().bot
-                if hasattr(bot, 'send_cdn_voice_msg'):
-                    xml = raw_message.xml
-                    for i in range(self.max_retries):
-                        try:
-                            await bot.send_cdn_voice_msg(target_group, xml)
-                            logger.info(f"[MacMessageForwarder] 语音消息已通过XML转发到 {target_group}")
-                            
-                            # 如果需要显示发送者信息，额外发送一条文本消息
-                            if sender_name:
-                                sender_text = f"👆 语音来自: {sender_name}"
-                                reply = Reply(ReplyType.TEXT, sender_text)
-                                e_context['channel'].send(reply, target_group)
-                                
-                            return
-                        except Exception as e:
-                            logger.warning(f"[MacMessageForwarder] 通过XML转发语音失败(尝试 {i+1}/{self.max_retries}): {e}")
-                            await asyncio.sleep(self.retry_delay)
-                
-            # 回退处理：将语音转发为文本提示
+        else:
+            # 无法处理，发送提示
             if sender_name:
-                sender_text = f"[{sender_name}] 发送了一条语音消息，但无法直接转发"
+                sender_text = f"[{sender_name}] 发送了一条视频消息，但无法直接转发"
             else:
-                sender_text = "收到一条语音消息，但无法直接转发"
+                sender_text = "收到一条视频消息，但无法直接转发"
             
             reply = Reply(ReplyType.TEXT, sender_text)
             e_context['channel'].send(reply, target_group)
-            logger.info(f"[MacMessageForwarder] 语音消息无法直接转发，已发送提示到 {target_group}")
-        except Exception as e:
-            logger.error(f"[MacMessageForwarder] 转发语音消息失败: {e}")
-
-    async def _forward_video(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
-        """转发视频消息"""
-        try:
-            context = e_context['context']
-            raw_message = None
-            
-            # 获取原始消息对象
-            if hasattr(context, 'msg_id') and context.msg_id in self.raw_messages:
-                raw_message = self.raw_messages[context.msg_id]
-                
-            # 优先使用原始消息中的XML进行转发
-            if raw_message and hasattr(raw_message, 'xml'):
-                # 使用Mac协议的视频转发功能
-                bot = BOT().bot
-                if hasattr(bot, 'send_cdn_video_msg'):
-                    xml = raw_message.xml
-                    for i in range(self.max_retries):
-                        try:
-                            await bot.send_cdn_video_msg(target_group, xml)
-                            logger.info(f"[MacMessageForwarder] 视频消息已通过XML转发到 {target_group}")
-                            
-                            # 如果需要显示发送者信息，额外发送一条文本消息
-                            if sender_name:
-                                sender_text = f"👆 视频来自: {sender_name}"
-                                reply = Reply(ReplyType.TEXT, sender_text)
-                                e_context['channel'].send(reply, target_group)
-                                
-                            return
-                        except Exception as e:
-                            logger.warning(f"[MacMessageForwarder] 通过XML转发视频失败(尝试 {i+1}/{self.max_retries}): {e}")
-                            await asyncio.sleep(self.retry_delay)
             
-            # 回退处理：发送视频文件或提示
-            video_url = context.content
-            if video_url and (video_url.startswith('http') or video_url.startswith('/')):
-                # 尝试作为普通消息发送
-                reply = Reply(ReplyType.TEXT, f"收到视频消息，链接为: {video_url}")
-                e_context['channel'].send(reply, target_group)
-                
-                if sender_name:
-                    sender_text = f"👆 视频来自: {sender_name}"
-                    reply = Reply(ReplyType.TEXT, sender_text)
-                    e_context['channel'].send(reply, target_group)
-            else:
-                # 无法处理，发送提示
-                if sender_name:
-                    sender_text = f"[{sender_name}] 发送了一条视频消息，但无法直接转发"
-                else:
-                    sender_text = "收到一条视频消息，但无法直接转发"
-                
-                reply = Reply(ReplyType.TEXT, sender_text)
-                e_context['channel'].send(reply, target_group)
-                
-            logger.info(f"[MacMessageForwarder] 视频消息已尝试转发到 {target_group}")
-        except Exception as e:
-            logger.error(f"[MacMessageForwarder] 转发视频消息失败: {e}")
+        logger.info("[MacMessageForwarder] 视频消息已尝试转发到 %s", target_group)
 
-    async def _forward_file(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
-        """转发文件消息"""
-        try:
-            context = e_context['context']
-            raw_message = None
-            
-            # 获取原始消息对象
-            if hasattr(context, 'msg_id') and context.msg_id in self.raw_messages:
-                raw_message = self.raw_messages[context.msg_id]
-                
-            # 优先使用原始消息中的XML进行转发
-            if raw_message and hasattr(raw_message, 'xml'):
-                # 使用Mac协议的文件转发功能
-                bot = BOT().bot
-                if hasattr(bot, 'send_cdn_file_msg'):
-                    xml = raw_message.xml
-                    for i in range(self.max_retries):
-                        try:
-                            await bot.send_cdn_file_msg(target_group, xml)
-                            logger.info(f"[MacMessageForwarder] 文件消息已通过XML转发到 {target_group}")
-                            
-                            # 如果需要显示发送者信息，额外发送一条文本消息
-                            if sender_name:
-                                sender_text = f"👆 文件来自: {sender_name}"
-                                reply = Reply(ReplyType.TEXT, sender_text)
-                                e_context['channel'].send(reply, target_group)
-                                
-                            return
-                        except Exception as e:
-                            logger.warning(f"[MacMessageForwarder] 通过XML转发文件失败(尝试 {i+1}/{self.max_retries}): {e}")
-                            await asyncio.sleep(self.retry_delay)
-            
-            # 回退处理：尝试获取文件名
-            file_path = context.content
-            file_name = file_path.split('/')[-1] if '/' in file_path else file_path.split('\\')[-1] if '\\' in file_path else "未知文件"
+    def _fallback_file(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
+        """文件回退处理：发送文件名提示"""
+        file_path = e_context['context'].content
+        file_name = file_path.split('/')[-1] if '/' in file_path else file_path.split('\\')[-1] if '\\' in file_path else "未知文件"
+        
+        # 发送文件信息提示
+        if sender_name:
+            reply_text = f"[{sender_name}] 发送了文件: {file_name}，但无法直接转发"
+        else:
+            reply_text = f"收到文件: {file_name}，但无法直接转发"
             
-            # 发送文件信息提示
-            if sender_name:
-                reply_text = f"[{sender_name}] 发送了文件: {file_name}，但无法直接转发"
-            else:
-                reply_text = f"收到文件: {file_name}，但无法直接转发"
-                
-            reply = Reply(ReplyType.TEXT, reply_text)
-            e_context['channel'].send(reply, target_group)
-            logger.info(f"[MacMessageForwarder] 文件消息无法直接转发，已发送提示到 {target_group}")
-        except Exception as e:
-            logger.error(f"[MacMessageForwarder] 转发文件消息失败: {e}")
+        reply = Reply(ReplyType.TEXT, reply_text)
+        e_context['channel'].send(reply, target_group)
+        logger.info("[MacMessageForwarder] 文件消息无法直接转发，已发送提示到 %s", target_group)
 
     async def _forward_sharing(self, e_context: EventContext, target_group: str, sender_name: Optional[str]):
         """转发分享消息(小程序/链接)"""
         try:
             context = e_context['context']
-            raw_message = None
             sharing_content = context.content
             
             # 获取原始消息对象
-            if hasattr(context, 'msg_id') and context.msg_id in self.raw_messages:
-                raw_message = self.raw_messages[context.msg_id]
+            raw_message = self.raw_messages.get(getattr(context, 'msg_id', None))
                 
             # 判断是否为小程序消息
             is_mini_program = False
@@ -447,53 +506,38 @@ class MacMessageForwarder(PluginBase):
             # 优先使用原始消息中的XML进行转发
             if raw_message and hasattr(raw_message, 'xml'):
                 # 使用Mac协议的转发功能
-                bot = BOT().bot
+                bot = self._bot
                 try_forward = False
                 
-                if is_mini_program and hasattr(bot, 'forward_mini_app'):
-                    # 小程序转发
-                    xml = raw_message.xml
-                    for i in range(self.max_retries):
-                        try:
-                            # 获取小程序封面URL
-                            cover_img_url = ""
-                            if isinstance(sharing_content, dict) and "thumb_url" in sharing_content:
-                                cover_img_url = sharing_content["thumb_url"]
-                                
-                            await bot.forward_mini_app(target_group, xml, cover_img_url)
-                            logger.info(f"[MacMessageForwarder] 小程序消息已通过XML转发到 {target_group}")
-                            try_forward = True
-                            
-                            # 如果需要显示发送者信息，额外发送一条文本消息
-                            if sender_name:
-                                sender_text = f"👆 小程序来自: {sender_name}"
-                                reply = Reply(ReplyType.TEXT, sender_text)
-                                e_context['channel'].send(reply, target_group)
-                                
-                            break
-                        except Exception as e:
-                            logger.warning(f"[MacMessageForwarder] 通过XML转发小程序失败(尝试 {i+1}/{self.max_retries}): {e}")
-                            await asyncio.sleep(self.retry_delay)
+                if is_mini_program and 'forward_mini_app' in self._bot_caps:
+                    # 小程序转发，获取小程序封面URL
+                    cover_img_url = ""
+                    if isinstance(sharing_content, dict) and "thumb_url" in sharing_content:
+                        cover_img_url = sharing_content["thumb_url"]
+                        
+                    try_forward = await self._send_with_retry(
+                        bot.forward_mini_app, target_group, raw_message.xml, cover_img_url, label="小程序"
+                    )
+                    if try_forward:
+                        logger.info("[MacMessageForwarder] 小程序消息已通过XML转发到 %s", target_group)
+                        
+                        # 如果需要显示发送者信息，额外发送一条文本消息
+                        if sender_name:
+                            sender_text = f"👆 小程序来自: {sender_name}"
+                            reply = Reply(ReplyType.TEXT, sender_text)
+                            e_context['channel'].send(reply, target_group)
                 
-                elif hasattr(bot, 'forward_url'):
+                elif 'forward_url' in self._bot_caps:
                     # 链接转发
-                    xml = raw_message.xml
-                    for i in range(self.max_retries):
-                        try:
-                            await bot.forward_url(target_group, xml)
-                            logger.info(f"[MacMessageForwarder] 链接消息已通过XML转发到 {target_group}")
-                            try_forward = True
-                            
-                            # 如果需要显示发送者信息，额外发送一条文本消息
-                            if sender_name:
-                                sender_text = f"👆 链接来自: {sender_name}"
-                                reply = Reply(ReplyType.TEXT, sender_text)
-                                e_context['channel'].send(reply, target_group)
-                                
-                            break
-                        except Exception as e:
-                            logger.warning(f"[MacMessageForwarder] 通过XML转发链接失败(尝试 {i+1}/{self.max_retries}): {e}")
-                            await asyncio.sleep(self.retry_delay)
+                    try_forward = await self._send_with_retry(bot.forward_url, target_group, raw_message.xml, label="链接")
+                    if try_forward:
+                        logger.info("[MacMessageForwarder] 链接消息已通过XML转发到 %s", target_group)
+                        
+                        # 如果需要显示发送者信息，额外发送一条文本消息
+                        if sender_name:
+                            sender_text = f"👆 链接来自: {sender_name}"
+                            reply = Reply(ReplyType.TEXT, sender_text)
+                            e_context['channel'].send(reply, target_group)
                 
                 # 如果已成功转发，直接返回
                 if try_forward:
@@ -503,9 +547,13 @@ class MacMessageForwarder(PluginBase):
             try:
                 # 解析分享内容
                 if isinstance(sharing_content, str):
-                    try:
-                        sharing_content = json.loads(sharing_content)
-                    except:
+                    # 只有看起来像JSON时才尝试解析，URL字符串直接处理，避免抛出异常的开销
+                    if sharing_content.lstrip()[:1] in ('{', '['):
+                        try:
+                            sharing_content = _json_loads(sharing_content)
+                        except ValueError:
+                            sharing_content = {"url": sharing_content}
+                    else:
                         # 可能是URL字符串
                         sharing_content = {"url": sharing_content}
                 
@@ -524,7 +572,7 @@ class MacMessageForwarder(PluginBase):
                         'thumb_url': thumb_url
                     })
                     e_context['channel'].send(reply, target_group)
-                    logger.info(f"[MacMessageForwarder] 分享消息已转发到 {target_group}")
+                    logger.info("[MacMessageForwarder] 分享消息已转发到 %s", target_group)
                     
                     # 如果需要显示发送者信息，额外发送一条文本消息
                     if sender_name:
@@ -540,7 +588,7 @@ class MacMessageForwarder(PluginBase):
                         
                     reply = Reply(ReplyType.TEXT, reply_text)
                     e_context['channel'].send(reply, target_group)
-                    logger.info(f"[MacMessageForwarder] 无法解析的分享消息，已发送提示到 {target_group}")
+                    logger.info("[MacMessageForwarder] 无法解析的分享消息，已发送提示到 %s", target_group)
             except Exception as e:
                 logger.error(f"[MacMessageForwarder] 解析分享内容失败: {e}")
                 
@@ -555,40 +603,31 @@ class MacMessageForwarder(PluginBase):
         except Exception as e:
             logger.error(f"[MacMessageForwarder] 转发分享消息失败: {e}")
 
-    def _get_message_hash(self, context, from_group_id: str) -> str:
-        """生成消息的唯一哈希值用于去重"""
+    def _get_message_hash(self, context, from_group_id: str) -> Union[str, tuple]:
+        """生成消息的唯一键用于去重"""
         msg_id = getattr(context, 'msg_id', '')
         if msg_id:
             # 有消息ID，直接使用
             return f"{from_group_id}:{msg_id}"
             
-        # 没有消息ID，使用内容+时间戳生成哈希
-        content = str(context.content)[:100]  # 取前100个字符，避免过长
-        msg_type = str(context.type)
-        create_time = str(int(time.time() * 1000))
-        
-        # 组合消息特征
-        msg_str = f"{msg_type}:{from_group_id}:{content}:{create_time}"
-        return hashlib.md5(msg_str.encode()).hexdigest()
+        # 没有消息ID，使用内容+时间戳组合成元组作为键，无需计算md5
+        return (
+            str(context.type),
+            from_group_id,
+            str(context.content)[:100],  # 取前100个字符，避免过长
+            int(time.time() * 1000),
+        )
 
-    def _is_duplicate(self, msg_hash: str) -> bool:
+    def _is_duplicate(self, msg_hash: Union[str, tuple]) -> bool:
         """检查消息是否重复"""
         # 如果禁用了去重功能，始终返回False
         if not self.enable_deduplication:
             return False
             
-        now = time.time()
+        # 缓存期内重复的消息返回True，过期条目由缓存自动淘汰
         if msg_hash in self.dedup_cache:
-            # 如果消息在缓存期内重复，返回True
-            if now - self.dedup_cache[msg_hash] < 60:  # 短时间内重复消息固定为1分钟
-                return True
-        self.dedup_cache[msg_hash] = now
-        
-        # 清理过期的缓存项
-        expired_keys = [k for k, v in self.dedup_cache.items() if now - v > self.cache_expiry]
-        for k in expired_keys:
-            del self.dedup_cache[k]
-            
+            return True
+        self.dedup_cache[msg_hash] = time.time()
         return False
 
     def get_config(self) -> dict:
@@ -634,7 +673,7 @@ class MacMessageForwarder(PluginBase):
             "monitor_users": [],  # 要监听的用户ID列表，为空则监听所有用户
             "show_sender_info": True,  # 是否在转发的消息中显示原发送者信息
             "max_retries": 3,  # 转发失败时的最大重试次数
-            "retry_delay": 1,  # 重试间隔(秒)
+            "retry_delay": 1,  # 首次重试间隔(秒)
             "timeout": 30,  # 消息转发超时时间(秒)
             "use_xml_forward": True,  # 是否使用XML转发方式
             "enable_deduplication": True,  # 是否启用去重功能